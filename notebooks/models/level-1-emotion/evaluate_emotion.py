@@ -1,7 +1,14 @@
 import os
 import json
+import numpy as np
 from datetime import datetime
 
+try:
+    import orjson
+except ImportError:
+    orjson = None  # fall back to stdlib json
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 # Suppress TensorFlow warnings
 os.environ["TF_CPP_MIN_LOG_LEVEL"] = "3"
 
@@ -10,6 +17,45 @@ warnings.filterwarnings("ignore")
 
 from emotion_detector import analyze_emotion
 
+# Supported video formats
+VIDEO_EXTS = (".mp4", ".avi", ".mov", ".mkv", ".flv")
+
+
+def write_json(path, data):
+    """Serialize with orjson when available, stdlib json otherwise"""
+    if orjson is not None:
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
+    else:
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2)
+
+
+# Columnar result store: one list per field instead of a dict per video
+RESULT_COLUMNS = ("video_path", "emotion", "prediction", "confidence", "ground_truth", "error")
+
+
+def new_columns():
+    return {k: [] for k in RESULT_COLUMNS}
+
+
+def append_result(cols, result):
+    for k in RESULT_COLUMNS:
+        cols[k].append(result.get(k))
+
+
+def rows_from_columns(cols):
+    """
+    Synthesize per-row dicts only for the JSON output
+    """
+    rows = []
+    for i in range(len(cols["video_path"])):
+        row = {k: cols[k][i] for k in RESULT_COLUMNS if k != "error"}
+        if cols["error"][i] is not None:
+            row["error"] = cols["error"][i]
+        rows.append(row)
+    return rows
+
 
 # ==============================
 # ANALYZE SINGLE VIDEO
@@ -95,16 +141,15 @@ def process_dataset(fake_dir="fake", real_dir="real", output_file="emotion_resul
     print("EMOTION DATASET PROCESSING")
     print("=" * 60)
 
-    video_ext = [".mp4", ".avi", ".mov", ".mkv", ".flv"]
-
     def collect_videos(folder):
-        if not os.path.exists(folder):
+        if not os.path.isdir(folder):
             return []
-        return [
-            os.path.join(folder, f)
-            for f in sorted(os.listdir(folder))
-            if any(f.lower().endswith(ext) for ext in video_ext)
-        ]
+        # scandir yields pre-stat'd entries with .path, so no
+        # os.path.join or extra stat per file
+        return sorted(
+            e.path for e in os.scandir(folder)
+            if e.is_file() and e.name.lower().endswith(VIDEO_EXTS)
+        )
 
     fake_videos = collect_videos(fake_dir)
     real_videos = collect_videos(real_dir)
@@ -118,37 +163,32 @@ def process_dataset(fake_dir="fake", real_dir="real", output_file="emotion_resul
         print("No videos found.")
         return
 
-    all_results = []
+    cols = new_columns()
 
     # ======================
-    # FAKE BATCH
+    # PARALLEL PROCESSING
     # ======================
+    jobs = [(v, "FAKE") for v in fake_videos] + [(v, "REAL") for v in real_videos]
+
     print("\n" + "=" * 60)
-    print("Batch: FAKE")
+    print(f"Processing {len(jobs)} videos on {os.cpu_count()} workers")
     print("=" * 60)
 
-    for vid in fake_videos:
-        name = os.path.basename(vid)
-        print(f"\nProcessing: {name}...")
-        r = analyze_video(vid)
-        r["ground_truth"] = "FAKE"
-        all_results.append(r)
-        print_video_details(name, r, "FAKE")
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        futures = {
+            executor.submit(analyze_video, vid): (vid, label)
+            for vid, label in jobs
+        }
 
-    # ======================
-    # REAL BATCH
-    # ======================
-    print("\n" + "=" * 60)
-    print("Batch: REAL")
-    print("=" * 60)
+        for future in as_completed(futures):
+            vid, label = futures[future]
+            name = os.path.basename(vid)
+
+            r = future.result()
+            r["ground_truth"] = label
+            append_result(cols, r)
 
-    for vid in real_videos:
-        name = os.path.basename(vid)
-        print(f"\nProcessing: {name}...")
-        r = analyze_video(vid)
-        r["ground_truth"] = "REAL"
-        all_results.append(r)
-        print_video_details(name, r, "REAL")
+            print_video_details(name, r, label)
 
     # ======================
     # METRICS
@@ -157,27 +197,17 @@ def process_dataset(fake_dir="fake", real_dir="real", output_file="emotion_resul
     print("EVALUATION SUMMARY")
     print("=" * 60)
 
-    tp = tn = fp = fn = correct = 0
-
-    for r in all_results:
-        pred = r.get("prediction")
-        gt = r["ground_truth"]
-
-        if not pred:
-            continue
-
-        if pred == gt:
-            correct += 1
+    # Branchless counters: mask sums over the prediction/label columns
+    # (results without a prediction match none of the masks)
+    pred = np.array([p or "" for p in cols["prediction"]])
+    gt = np.array(cols["ground_truth"])
 
-        if gt == "FAKE" and pred == "FAKE":
-            tp += 1
-        elif gt == "REAL" and pred == "REAL":
-            tn += 1
-        elif gt == "REAL" and pred == "FAKE":
-            fp += 1
-        elif gt == "FAKE" and pred == "REAL":
-            fn += 1
+    tp = int(((gt == "FAKE") & (pred == "FAKE")).sum())
+    tn = int(((gt == "REAL") & (pred == "REAL")).sum())
+    fp = int(((gt == "REAL") & (pred == "FAKE")).sum())
+    fn = int(((gt == "FAKE") & (pred == "REAL")).sum())
 
+    correct = tp + tn
     total_valid = tp + tn + fp + fn
 
     acc = (correct / total_valid * 100) if total_valid else 0
@@ -201,6 +231,7 @@ def process_dataset(fake_dir="fake", real_dir="real", output_file="emotion_resul
     # ======================
     # SAVE JSON
     # ======================
+    results = rows_from_columns(cols)
     output = {
         "timestamp": datetime.now().isoformat(),
         "summary": {
@@ -215,16 +246,15 @@ def process_dataset(fake_dir="fake", real_dir="real", output_file="emotion_resul
                 "FN": fn
             }
         },
-        "results": all_results
+        "results": results
     }
 
-    with open(output_file, "w") as f:
-        json.dump(output, f, indent=2)
+    write_json(output_file, output)
 
     print(f"\nSaved to: {output_file}")
     print("=" * 60)
 
-    return all_results
+    return results
 
 
 # ==============================
@@ -1,7 +1,14 @@
 import os
 import json
+import numpy as np
 from datetime import datetime
 
+try:
+    import orjson
+except ImportError:
+    orjson = None  # fall back to stdlib json
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 # Suppress warnings
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
 import warnings
@@ -9,6 +16,58 @@ warnings.filterwarnings('ignore')
 
 from blink_detector import analyze_blink  # pastikan blink_detector.py ada
 
+# Supported video formats
+VIDEO_EXTS = ('.mp4', '.avi', '.mov', '.mkv', '.flv')
+
+
+def write_json(path, data):
+    """Serialize with orjson when available, stdlib json otherwise"""
+    if orjson is not None:
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
+    else:
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2)
+
+
+# Columnar result store: one list per field instead of a dict per video
+RESULT_COLUMNS = ("video_path", "blink", "prediction", "confidence", "ground_truth", "error")
+
+
+def new_columns():
+    return {k: [] for k in RESULT_COLUMNS}
+
+
+def append_result(cols, result):
+    for k in RESULT_COLUMNS:
+        cols[k].append(result.get(k))
+
+
+def rows_from_columns(cols):
+    """
+    Synthesize per-row dicts only for the JSON output
+    """
+    rows = []
+    for i in range(len(cols["video_path"])):
+        row = {k: cols[k][i] for k in RESULT_COLUMNS if k != "error"}
+        if cols["error"][i] is not None:
+            row["error"] = cols["error"][i]
+        rows.append(row)
+    return rows
+
+
+def collect_videos(folder):
+    """
+    List video files in a folder via os.scandir (pre-stat'd entries,
+    no per-file os.path.join)
+    """
+    if not os.path.isdir(folder):
+        return []
+    return sorted(
+        e.path for e in os.scandir(folder)
+        if e.is_file() and e.name.lower().endswith(VIDEO_EXTS)
+    )
+
 
 def analyze_video(video_path, verbose=False):
     """
@@ -76,14 +135,9 @@ def process_dataset(fake_dir="fake", real_dir="real", output_file="blink_results
     print("BLINK DATASET PROCESSING")
     print("="*60)
 
-    # Supported video formats
-    video_extensions = ['.mp4', '.avi', '.mov', '.mkv', '.flv']
-
     # Collect videos
-    fake_videos = [os.path.join(fake_dir, f) for f in sorted(os.listdir(fake_dir))
-                   if any(f.lower().endswith(ext) for ext in video_extensions)] if os.path.exists(fake_dir) else []
-    real_videos = [os.path.join(real_dir, f) for f in sorted(os.listdir(real_dir))
-                   if any(f.lower().endswith(ext) for ext in video_extensions)] if os.path.exists(real_dir) else []
+    fake_videos = collect_videos(fake_dir)
+    real_videos = collect_videos(real_dir)
 
     print(f"Found {len(fake_videos)} fake videos, {len(real_videos)} real videos")
     total_videos = len(fake_videos) + len(real_videos)
@@ -91,60 +145,58 @@ def process_dataset(fake_dir="fake", real_dir="real", output_file="blink_results
         print("No videos found. Exiting...")
         return
 
-    all_results = []
+    cols = new_columns()
+
+    # Process videos in parallel, one process per video
+    jobs = [(v, "FAKE") for v in fake_videos] + [(v, "REAL") for v in real_videos]
 
-    # Process fake videos
-    print("\n" + "="*60)
-    print("Batch: FAKE")
-    print("="*60)
-    for video_path in fake_videos:
-        filename = os.path.basename(video_path)
-        print(f"\nProcessing: {filename}...")
-        result = analyze_video(video_path, verbose=False)
-        result["ground_truth"] = "FAKE"
-        all_results.append(result)
-        print_video_details(filename, result, "FAKE")
-
-    # Process real videos
     print("\n" + "="*60)
-    print("Batch: REAL")
+    print(f"Processing {len(jobs)} videos on {os.cpu_count()} workers")
     print("="*60)
-    for video_path in real_videos:
-        filename = os.path.basename(video_path)
-        print(f"\nProcessing: {filename}...")
-        result = analyze_video(video_path, verbose=False)
-        result["ground_truth"] = "REAL"
-        all_results.append(result)
-        print_video_details(filename, result, "REAL")
+
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        futures = {
+            executor.submit(analyze_video, video_path): (video_path, label)
+            for video_path, label in jobs
+        }
+        for future in as_completed(futures):
+            video_path, label = futures[future]
+            filename = os.path.basename(video_path)
+            result = future.result()
+            result["ground_truth"] = label
+            append_result(cols, result)
+            print_video_details(filename, result, label)
 
     # Metrics
     print("\n" + "="*60)
     print("EVALUATION SUMMARY")
     print("="*60)
 
-    correct = sum(1 for r in all_results if r.get("prediction") == r.get("ground_truth"))
-    total = len(all_results)
+    pred = np.array([p or "" for p in cols["prediction"]])
+    gt = np.array(cols["ground_truth"])
+    correct = int((pred == gt).sum())
+    total = len(cols["ground_truth"])
     accuracy = (correct / total * 100) if total > 0 else 0
 
     print(f"\nOverall Accuracy: {accuracy:.1f}% ({correct}/{total})")
 
     # Save results
+    results = rows_from_columns(cols)
     output_data = {
         "timestamp": datetime.now().isoformat(),
         "summary": {
             "total_videos": total,
             "accuracy": accuracy
         },
-        "results": all_results
+        "results": results
     }
 
-    with open(output_file, 'w') as f:
-        json.dump(output_data, f, indent=2)
+    write_json(output_file, output_data)
 
     print(f"\nResults saved to: {output_file}")
     print("="*60)
 
-    return all_results
+    return results
 
 
 if __name__ == "__main__":
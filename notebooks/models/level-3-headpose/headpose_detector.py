@@ -1,150 +1,330 @@
 import os
 import cv2
+import math
 import mediapipe as mp
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor, wait
 
+try:
+    import av
+except ImportError:
+    av = None  # optional; cv2.VideoCapture fallback
 
-mp_face_mesh = mp.solutions.face_mesh
-mp_drawing = mp.solutions.drawing_utils
-
-
-def analyze_headpose(
-    video_path,
-    verbose=False,
-    save_debug=True,
-    debug_dir="debug_headpose",
-    max_debug_frames=100
-):
-    """
-    Head pose analysis with MediaPipe + debug frame export
-    """
+try:
+    from numba import njit
+except ImportError:
+    # numba is optional; without it the kernel runs as plain Python
+    def njit(*args, **kwargs):
+        def wrap(func):
+            return func
+        if args and callable(args[0]):
+            return args[0]
+        return wrap
 
-    cap = cv2.VideoCapture(video_path)
 
-    if not cap.isOpened():
-        return {"success": False, "reason": "cannot_open_video"}
-
-    if save_debug:
-        os.makedirs(debug_dir, exist_ok=True)
-
-    pitch_vals = []
-    yaw_vals = []
-    roll_vals = []
+mp_face_mesh = mp.solutions.face_mesh
 
-    debug_frame_id = 0
-    total_frames = 0
+PROCESS_WIDTH = 640  # max width fed to face mesh
+
+# Background writer so JPEG encode + disk flush do not block inference
+_WRITER = ThreadPoolExecutor(max_workers=2)
+
+# Debug frames are for eyeballing only; quality 60 encodes 2-4x faster
+JPEG_PARAMS = [cv2.IMWRITE_JPEG_QUALITY, 60, cv2.IMWRITE_JPEG_PROGRESSIVE, 0]
+
+# Lazy per-process FaceMesh so TFLite setup happens once, not per video
+_FACE_MESH = None
+
+
+def _get_face_mesh():
+    global _FACE_MESH
+    if _FACE_MESH is None:
+        _FACE_MESH = mp_face_mesh.FaceMesh(
+            static_image_mode=False,
+            max_num_faces=1,
+            refine_landmarks=True
+        )
+    return _FACE_MESH
+
+
+# Optional Tasks-API backend: the solutions API is FP32/XNNPACK only,
+# so a quantized or GPU-delegated face_landmarker.task model can be
+# dropped in via this env var to speed up inference
+FACE_LANDMARKER_TASK = os.environ.get("FACE_LANDMARKER_TASK", "")
+_TASK_LANDMARKER = None
+_TASK_LANDMARKER_FAILED = False
+
+
+def _get_task_landmarker():
+    global _TASK_LANDMARKER, _TASK_LANDMARKER_FAILED
+    if _TASK_LANDMARKER is None and not _TASK_LANDMARKER_FAILED \
+            and FACE_LANDMARKER_TASK and os.path.exists(FACE_LANDMARKER_TASK):
+        try:
+            from mediapipe.tasks import python as mp_tasks
+            from mediapipe.tasks.python import vision as mp_vision
+
+            delegate = (
+                mp_tasks.BaseOptions.Delegate.GPU
+                if os.environ.get("FACE_LANDMARKER_GPU")
+                else mp_tasks.BaseOptions.Delegate.CPU
+            )
+            _TASK_LANDMARKER = mp_vision.FaceLandmarker.create_from_options(
+                mp_vision.FaceLandmarkerOptions(
+                    base_options=mp_tasks.BaseOptions(
+                        model_asset_path=FACE_LANDMARKER_TASK,
+                        delegate=delegate
+                    ),
+                    num_faces=1
+                )
+            )
+        except Exception as e:
+            # Remember the failure: a misconfigured task file would
+            # otherwise re-import and re-fail on every single frame
+            _TASK_LANDMARKER_FAILED = True
+            print(f"WARNING: FaceLandmarker init failed ({e}), falling back to FaceMesh")
+    return _TASK_LANDMARKER
 
-    with mp_face_mesh.FaceMesh(
-        static_image_mode=False,
-        max_num_faces=1,
-        refine_landmarks=True
-    ) as face_mesh:
 
+def detect_landmarks(rgb_frame):
+    """
+    Return the first face's landmark list or None.
+    Uses the Tasks-API landmarker when configured, FaceMesh otherwise.
+    """
+    landmarker = _get_task_landmarker()
+    if landmarker is not None:
+        image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb_frame)
+        detection = landmarker.detect(image)
+        if not detection.face_landmarks:
+            return None
+        return detection.face_landmarks[0]
+
+    results = _get_face_mesh().process(rgb_frame)
+    if not results.multi_face_landmarks:
+        return None
+    return results.multi_face_landmarks[0].landmark
+
+
+def _av_frames(container):
+    stream = container.streams.video[0]
+    stream.thread_type = "AUTO"  # frame + slice threaded decode
+    with container:
+        for frame in container.decode(stream):
+            yield frame.to_ndarray(format="bgr24")
+
+
+def _cv2_frames(cap):
+    try:
         while True:
             ret, frame = cap.read()
             if not ret:
                 break
+            yield frame
+    finally:
+        cap.release()
 
-            total_frames += 1
 
-            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            results = face_mesh.process(rgb)
-
-            if not results.multi_face_landmarks:
-                continue
+def _frame_source(video_path):
+    """
+    Return a frame iterator using PyAV with threaded FFmpeg decode
+    when installed, cv2.VideoCapture otherwise. None if the video
+    cannot be opened.
+    """
+    if av is not None:
+        try:
+            container = av.open(video_path)
+        except Exception:
+            return None
+        return _av_frames(container)
 
-            face = results.multi_face_landmarks[0]
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        return None
+    return _cv2_frames(cap)
 
-            # ===== Landmark extraction =====
-            nose = face.landmark[1]
-            left_eye = face.landmark[33]
-            right_eye = face.landmark[263]
 
-            dx = right_eye.x - left_eye.x
-            dy = right_eye.y - left_eye.y
+# Online pose statistics: count, per-axis sums and sums of squares,
+# speed sum / sum of squares, and the previous (pitch, yaw, roll)
+POSE_ACC_ZERO = (0.0,) * 12
 
-            roll = np.arctan2(dy, dx)
-            yaw = nose.x - 0.5
-            pitch = nose.y - 0.5
 
-            pitch_vals.append(pitch)
-            yaw_vals.append(yaw)
-            roll_vals.append(roll)
+@njit(cache=True, fastmath=True)
+def pose_update(acc, p, y, r):
+    """
+    Fold one frame's (pitch, yaw, roll) into the running statistics.
+    Constant memory: no per-frame history is kept.
+    """
+    n, sp, sy, sr, spp, syy, srr, ss, sss, lp, ly, lr = acc
+
+    if n > 0.0:
+        dp = p - lp
+        dy = y - ly
+        dr = r - lr
+        s = (dp * dp + dy * dy + dr * dr) ** 0.5
+        ss += s
+        sss += s * s
+
+    return (
+        n + 1.0,
+        sp + p, sy + y, sr + r,
+        spp + p * p, syy + y * y, srr + r * r,
+        ss, sss,
+        p, y, r
+    )
 
-            # ===== Debug frame export =====
-            if save_debug and debug_frame_id < max_debug_frames:
 
-                h, w, _ = frame.shape
+def pose_finalize(acc):
+    """
+    Closed-form means/variances from the accumulated sums
+    """
+    n, sp, sy, sr, spp, syy, srr, ss, sss, _, _, _ = acc
 
-                # Draw landmarks
-                annotated = frame.copy()
-                mp_drawing.draw_landmarks(
-                    annotated,
-                    face,
-                    mp_face_mesh.FACEMESH_CONTOURS
-                )
+    avg_pitch = sp / n
+    avg_yaw = sy / n
+    avg_roll = sr / n
 
-                # Overlay pose text
-                cv2.putText(
-                    annotated,
-                    f"Pitch: {pitch:.3f}",
-                    (10, 30),
-                    cv2.FONT_HERSHEY_SIMPLEX,
-                    0.7,
-                    (0, 255, 0),
-                    2
-                )
+    pose_variance = (
+        (spp / n - avg_pitch * avg_pitch) +
+        (syy / n - avg_yaw * avg_yaw) +
+        (srr / n - avg_roll * avg_roll)
+    )
 
-                cv2.putText(
-                    annotated,
-                    f"Yaw: {yaw:.3f}",
-                    (10, 60),
-                    cv2.FONT_HERSHEY_SIMPLEX,
-                    0.7,
-                    (0, 255, 0),
-                    2
-                )
+    m = n - 1.0
+    if m > 0.0:
+        avg_speed = ss / m
+        speed_variance = sss / m - avg_speed * avg_speed
+    else:
+        avg_speed = 0.0
+        speed_variance = 0.0
 
-                cv2.putText(
-                    annotated,
-                    f"Roll: {roll:.3f}",
-                    (10, 90),
-                    cv2.FONT_HERSHEY_SIMPLEX,
-                    0.7,
-                    (0, 255, 0),
-                    2
-                )
+    return avg_pitch, avg_yaw, avg_roll, pose_variance, avg_speed, speed_variance
 
-                debug_path = os.path.join(
-                    debug_dir,
-                    f"frame_{debug_frame_id:04d}.jpg"
-                )
 
-                cv2.imwrite(debug_path, annotated)
-                debug_frame_id += 1
+def analyze_headpose(
+    video_path,
+    verbose=False,
+    save_debug=True,
+    debug_dir="debug_headpose",
+    max_debug_frames=100
+):
+    """
+    Head pose analysis with MediaPipe + debug frame export
+    """
 
-    cap.release()
+    frames = _frame_source(video_path)
 
-    if len(pitch_vals) == 0:
-        return {"success": False, "reason": "no_face_detected"}
+    if frames is None:
+        return {"success": False, "reason": "cannot_open_video"}
 
-    pitch = np.array(pitch_vals)
-    yaw = np.array(yaw_vals)
-    roll = np.array(roll_vals)
+    if save_debug:
+        os.makedirs(debug_dir, exist_ok=True)
 
-    # ===== Advanced motion metrics =====
-    movements = np.stack([pitch, yaw, roll], axis=1)
-    diff = np.diff(movements, axis=0)
+    acc = POSE_ACC_ZERO
+    n_poses = 0
 
-    speed = np.linalg.norm(diff, axis=1)
-    speed_variance = float(np.var(speed))
-    avg_speed = float(np.mean(speed))
+    debug_frame_id = 0
+    total_frames = 0
+    pending_writes = []
+
+    for frame in frames:
+        total_frames += 1
+
+        # Face mesh detects fine at low resolution and landmarks are
+        # normalized, so shrink big frames before inference.
+        # Resize first: BGR->RGB on the small frame touches far fewer pixels
+        small = frame
+        if frame.shape[1] > PROCESS_WIDTH:
+            scale = PROCESS_WIDTH / frame.shape[1]
+            small = cv2.resize(
+                frame, None, fx=scale, fy=scale,
+                interpolation=cv2.INTER_AREA
+            )
+        rgb = cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
+
+        landmarks = detect_landmarks(rgb)
+
+        if landmarks is None:
+            continue
+
+        # ===== Landmark extraction =====
+        # One bulk copy out of the protobuf wrapper instead of
+        # repeated per-landmark attribute lookups
+        lm = np.array([(p.x, p.y) for p in landmarks], dtype=np.float32)
+
+        nose_x, nose_y = lm[1]
+        left_eye_x, left_eye_y = lm[33]
+        right_eye_x, right_eye_y = lm[263]
+
+        roll = math.atan2(right_eye_y - left_eye_y, right_eye_x - left_eye_x)
+        yaw = nose_x - 0.5
+        pitch = nose_y - 0.5
+
+        acc = pose_update(acc, float(pitch), float(yaw), float(roll))
+        n_poses += 1
+
+        # ===== Debug frame export =====
+        if save_debug and debug_frame_id < max_debug_frames:
+
+            h, w, _ = frame.shape
+
+            # Draw only the three landmarks the pose estimate uses;
+            # rendering the full FACEMESH_CONTOURS set is ~50x the work.
+            # The copy stays: the async writer owns the submitted buffer.
+            annotated = frame.copy()
+            for px, py in (lm[1], lm[33], lm[263]):
+                cv2.circle(annotated, (int(px * w), int(py * h)), 3, (0, 255, 0), -1)
+
+            # Overlay pose text
+            cv2.putText(
+                annotated,
+                f"Pitch: {pitch:.3f}",
+                (10, 30),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                0.7,
+                (0, 255, 0),
+                2
+            )
+
+            cv2.putText(
+                annotated,
+                f"Yaw: {yaw:.3f}",
+                (10, 60),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                0.7,
+                (0, 255, 0),
+                2
+            )
+
+            cv2.putText(
+                annotated,
+                f"Roll: {roll:.3f}",
+                (10, 90),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                0.7,
+                (0, 255, 0),
+                2
+            )
+
+            debug_path = os.path.join(
+                debug_dir,
+                f"frame_{debug_frame_id:04d}.jpg"
+            )
+
+            pending_writes.append(
+                _WRITER.submit(cv2.imwrite, debug_path, annotated, JPEG_PARAMS)
+            )
+            debug_frame_id += 1
+
+    if pending_writes:
+        wait(pending_writes)
+
+    if n_poses == 0:
+        return {"success": False, "reason": "no_face_detected"}
 
-    pose_variance = float(
-        np.var(pitch) +
-        np.var(yaw) +
-        np.var(roll)
-    )
+    # ===== Advanced motion metrics =====
+    avg_pitch, avg_yaw, avg_roll, pose_variance, avg_speed, speed_variance = pose_finalize(acc)
+    pose_variance = float(pose_variance)
+    avg_speed = float(avg_speed)
+    speed_variance = float(speed_variance)
 
     # ===== Heuristic =====
     suspicious = False
@@ -160,11 +340,11 @@ def analyze_headpose(
 
     result = {
         "success": True,
-        "frames_analyzed": len(pitch_vals),
+        "frames_analyzed": n_poses,
         "total_video_frames": total_frames,
-        "avg_pitch": float(np.mean(pitch)),
-        "avg_yaw": float(np.mean(yaw)),
-        "avg_roll": float(np.mean(roll)),
+        "avg_pitch": float(avg_pitch),
+        "avg_yaw": float(avg_yaw),
+        "avg_roll": float(avg_roll),
         "pose_variance": pose_variance,
         "avg_speed": avg_speed,
         "speed_variance": speed_variance,
@@ -1,14 +1,71 @@
 import os
+import cv2
 import json
+import numpy as np
 from datetime import datetime
 
+try:
+    import orjson
+except ImportError:
+    orjson = None  # fall back to stdlib json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 # Suppress TensorFlow warnings
 os.environ["TF_CPP_MIN_LOG_LEVEL"] = "3"
 
 import warnings
 warnings.filterwarnings("ignore")
 
-from texture_detector import analyze_texture
+from texture_detector import TextureRunner
+
+# One runner per worker process: a worker scores many videos, so the
+# tf.data pipeline setup and model handle are reused across them
+_RUNNER = None
+
+
+def _get_runner():
+    global _RUNNER
+    if _RUNNER is None:
+        _RUNNER = TextureRunner()
+    return _RUNNER
+
+
+# Supported video formats
+VIDEO_EXTS = frozenset({".mp4", ".avi", ".mov", ".mkv", ".flv"})
+
+# Fork workers inherit the imported module and Haar cascade via
+# copy-on-write; the TF model itself loads lazily inside each worker
+# (a fork-inherited TF runtime is unsupported), with the OS page
+# cache amortizing the repeated .h5 reads. Where fork is not
+# available (Windows), spawn re-imports per worker as before.
+try:
+    _MP_CONTEXT = multiprocessing.get_context("fork")
+except ValueError:
+    _MP_CONTEXT = None
+
+
+def write_json(path, data):
+    """Serialize with orjson when available, stdlib json otherwise"""
+    if orjson is not None:
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
+    else:
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2)
+
+
+def dump_line(obj):
+    """One compact JSON line (bytes) for the streaming NDJSON log"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY) + b"\n"
+    return (json.dumps(obj) + "\n").encode()
+
+
+def _init_worker():
+    # One video per process: keep OpenCV single-threaded so N workers
+    # do not spawn N x N threads
+    cv2.setNumThreads(1)
 
 
 # ==============================
@@ -24,7 +81,7 @@ def analyze_video(video_path, verbose=False):
     }
 
     try:
-        tex = analyze_texture(video_path, verbose=verbose)
+        tex = _get_runner().analyze(video_path)
 
         if not tex["success"]:
             result["error"] = tex.get("reason", "texture_failed")
@@ -80,16 +137,15 @@ def process_dataset(fake_dir="../fake", real_dir="../real", output_file="texture
     print("🧪 TEXTURE DATASET PROCESSING")
     print("=" * 60)
 
-    video_ext = [".mp4", ".avi", ".mov", ".mkv", ".flv"]
-
     def collect_videos(folder):
-        if not os.path.exists(folder):
+        if not os.path.isdir(folder):
             return []
-        return [
-            os.path.join(folder, f)
-            for f in sorted(os.listdir(folder))
-            if any(f.lower().endswith(ext) for ext in video_ext)
-        ]
+        # scandir yields pre-stat'd entries; the frozenset lookup is a
+        # single hash probe instead of one endswith per extension
+        return sorted(
+            e.path for e in os.scandir(folder)
+            if e.is_file() and os.path.splitext(e.name)[1].lower() in VIDEO_EXTS
+        )
 
     fake_videos = collect_videos(fake_dir)
     real_videos = collect_videos(real_dir)
@@ -99,56 +155,48 @@ def process_dataset(fake_dir="../fake", real_dir="../real", output_file="texture
 
     all_results = []
 
-    # FAKE
+    # PARALLEL PROCESSING
+    jobs = [(v, "FAKE") for v in fake_videos] + [(v, "REAL") for v in real_videos]
+
     print("\n" + "=" * 60)
-    print("Batch: FAKE")
+    print(f"🎬 Processing {len(jobs)} videos on {os.cpu_count()} workers")
     print("=" * 60)
 
-    for vid in fake_videos:
-        name = os.path.basename(vid)
-        print(f"\n🎬 Processing: {name}...")
-        r = analyze_video(vid)
-        r["ground_truth"] = "FAKE"
-        all_results.append(r)
-        print_video_details(name, r, "FAKE")
+    # Per-video results stream to an NDJSON sidecar as they finish, so
+    # a crash mid-run loses nothing and the final dump stays cheap
+    ndjson_file = os.path.splitext(output_file)[0] + ".ndjson"
 
-    # REAL
-    print("\n" + "=" * 60)
-    print("Batch: REAL")
-    print("=" * 60)
+    with ProcessPoolExecutor(max_workers=os.cpu_count(), initializer=_init_worker,
+                             mp_context=_MP_CONTEXT) as executor, \
+            open(ndjson_file, "wb") as stream:
+        futures = {
+            executor.submit(analyze_video, vid): (vid, label)
+            for vid, label in jobs
+        }
 
-    for vid in real_videos:
-        name = os.path.basename(vid)
-        print(f"\n🎬 Processing: {name}...")
-        r = analyze_video(vid)
-        r["ground_truth"] = "REAL"
-        all_results.append(r)
-        print_video_details(name, r, "REAL")
+        for future in as_completed(futures):
+            vid, label = futures[future]
+            name = os.path.basename(vid)
+
+            r = future.result()
+            r["ground_truth"] = label
+            all_results.append(r)
+            stream.write(dump_line(r))
+
+            print_video_details(name, r, label)
 
     # ======================
     # METRICS
     # ======================
-    tp = tn = fp = fn = correct = 0
-
-    for r in all_results:
-        pred = r.get("prediction")
-        gt = r["ground_truth"]
-
-        if not pred:
-            continue
-
-        if pred == gt:
-            correct += 1
+    # Pack (gt, pred) into 0..3 and bincount: the whole confusion
+    # matrix in one branchless pass over the valid results
+    gt = np.array([r["ground_truth"] == "FAKE" for r in all_results if r.get("prediction")], dtype=np.int64)
+    pr = np.array([r["prediction"] == "FAKE" for r in all_results if r.get("prediction")], dtype=np.int64)
 
-        if gt == "FAKE" and pred == "FAKE":
-            tp += 1
-        elif gt == "REAL" and pred == "REAL":
-            tn += 1
-        elif gt == "REAL" and pred == "FAKE":
-            fp += 1
-        elif gt == "FAKE" and pred == "REAL":
-            fn += 1
+    cm = np.bincount(gt * 2 + pr, minlength=4)
+    tn, fp, fn, tp = (int(v) for v in cm)
 
+    correct = tp + tn
     total_valid = tp + tn + fp + fn
 
     acc = (correct / total_valid * 100) if total_valid else 0
@@ -191,10 +239,10 @@ def process_dataset(fake_dir="../fake", real_dir="../real", output_file="texture
         "results": all_results
     }
 
-    with open(output_file, "w") as f:
-        json.dump(output, f, indent=2)
+    write_json(output_file, output)
 
     print(f"\n💾 Saved to: {output_file}")
+    print(f"💾 Streamed per-video log: {ndjson_file}")
     print("=" * 60)
 
     return all_results
@@ -1,5 +1,8 @@
 import os
 import cv2
+import queue
+import itertools
+import threading
 import numpy as np
 
 os.environ["TF_CPP_MIN_LOG_LEVEL"] = "3"
@@ -7,23 +10,486 @@ os.environ["TF_CPP_MIN_LOG_LEVEL"] = "3"
 import warnings
 warnings.filterwarnings("ignore")
 
+import tensorflow as tf
+
+# Explicit thread pinning: the OpenCV and TF pools otherwise both
+# claim every core and oversubscribe each other on many-core hosts.
+# Workers under the evaluator's process pool re-pin OpenCV to 1.
+cv2.setNumThreads(max(1, os.cpu_count() // 2))
+try:
+    tf.config.threading.set_intra_op_parallelism_threads(4)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+except RuntimeError:
+    pass  # TF context already initialized by an earlier import
+
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None  # optional; Keras/XLA path is the fallback
+
+try:
+    import av
+except ImportError:
+    av = None  # optional; cv2.VideoCapture fallback
+
+try:
+    from numba import njit
+except ImportError:
+    # numba is optional; without it the kernel runs as plain Python
+    def njit(*args, **kwargs):
+        def wrap(func):
+            return func
+        if args and callable(args[0]):
+            return args[0]
+        return wrap
+
+try:
+    import tensorrt as trt
+    import pycuda.driver as cuda
+    import pycuda.autoinit  # noqa: F401 - creates the CUDA context
+except ImportError:
+    trt = None  # optional; ONNX Runtime / XLA fallback
+
 from texture_classifiers import MesoInception4
 
 MODEL_PATH = "weights/MesoInception_DF.h5"
 FRAME_SKIP = 5
 IMG_SIZE = 256
-THRESHOLD = 0.5     
+BATCH_SIZE = 32
+THRESHOLD = 0.5
 
 # ==============================
 # LOAD OFFICIAL MODEL
 # ==============================
-model = MesoInception4()
-model.load(MODEL_PATH)
+# Loaded lazily so each of the evaluator's forked workers initializes
+# TF in its own process: running a fork-inherited TF runtime is
+# unsupported and a known deadlock source. The OS page cache still
+# amortizes the repeated .h5 reads across workers.
+_MODEL = None
+_INFER = None
+
+
+def _get_model():
+    global _MODEL, _INFER
+    if _MODEL is None:
+        _MODEL = MesoInception4()
+        _MODEL.load(MODEL_PATH)
+
+        # XLA-compiled forward pass: fuses conv/BN/activation kernels
+        # and skips the Keras predict machinery. Spatial dims stay
+        # static so XLA can specialize; only the batch dim varies.
+        _INFER = tf.function(
+            lambda x: _MODEL.model(x, training=False),
+            jit_compile=True,
+            input_signature=[tf.TensorSpec([None, IMG_SIZE, IMG_SIZE, 3], tf.float32)]
+        )
+    return _MODEL
+
+# ONNX Runtime inference: MLAS SIMD convolutions + graph fusion beat
+# Keras dispatch on CPU. Enabled when the exported model exists; the
+# int8-quantized model wins on VNNI-capable CPUs and is preferred.
+ONNX_PATH = "weights/meso.onnx"
+ONNX_INT8_PATH = "weights/meso_int8.onnx"
+
+ort_session = None
+if ort is not None:
+    _onnx_model = ONNX_INT8_PATH if os.path.exists(ONNX_INT8_PATH) else ONNX_PATH
+    if os.path.exists(_onnx_model):
+        so = ort.SessionOptions()
+        so.intra_op_num_threads = os.cpu_count()
+        so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        ort_session = ort.InferenceSession(
+            _onnx_model, sess_options=so, providers=["CPUExecutionProvider"]
+        )
+        ort_input_name = ort_session.get_inputs()[0].name
+
+
+def export_onnx(output_path=ONNX_PATH):
+    """
+    One-time Keras -> ONNX export (requires tf2onnx)
+    """
+    import tf2onnx
+    tf2onnx.convert.from_keras(_get_model().model, opset=15, output_path=output_path)
+    print(f"Exported ONNX model to: {output_path}")
+
+
+def quantize_onnx(input_path=ONNX_PATH, output_path=ONNX_INT8_PATH):
+    """
+    One-time post-training int8 quantization of the exported model.
+    Meso's small convnet tolerates int8 weights well.
+    """
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    quantize_dynamic(input_path, output_path, weight_type=QuantType.QInt8)
+    print(f"Quantized ONNX model saved to: {output_path}")
+
+
+# TensorRT FP16 engine: fastest path on NVIDIA GPUs. Build once from
+# the ONNX export with:
+#   trtexec --onnx=weights/meso.onnx --fp16 --saveEngine=weights/meso.trt \
+#           --minShapes=input:1x256x256x3 --optShapes=input:16x256x256x3 \
+#           --maxShapes=input:32x256x256x3
+TRT_ENGINE_PATH = "weights/meso.trt"
+
+
+class _TrtRunner:
+    """
+    Minimal TensorRT executor: pinned host buffers sized for the max
+    batch and async H2D/D2H copies on a private stream.
+    """
+
+    def __init__(self, engine_path):
+        logger = trt.Logger(trt.Logger.ERROR)
+        with open(engine_path, "rb") as f, trt.Runtime(logger) as runtime:
+            self.engine = runtime.deserialize_cuda_engine(f.read())
+        self.context = self.engine.create_execution_context()
+        self.stream = cuda.Stream()
+        self.h_in = cuda.pagelocked_empty((BATCH_SIZE, IMG_SIZE, IMG_SIZE, 3), np.float32)
+        self.h_out = cuda.pagelocked_empty((BATCH_SIZE, 1), np.float32)
+        self.d_in = cuda.mem_alloc(self.h_in.nbytes)
+        self.d_out = cuda.mem_alloc(self.h_out.nbytes)
+
+    def __call__(self, batch):
+        n = batch.shape[0]
+        self.h_in[:n] = batch
+        self.context.set_binding_shape(0, (n, IMG_SIZE, IMG_SIZE, 3))
+        cuda.memcpy_htod_async(self.d_in, self.h_in, self.stream)
+        self.context.execute_async_v2([int(self.d_in), int(self.d_out)], self.stream.handle)
+        cuda.memcpy_dtoh_async(self.h_out, self.d_out, self.stream)
+        self.stream.synchronize()
+        return self.h_out[:n].reshape(-1).copy()
+
+
+trt_runner = None
+if trt is not None and os.path.exists(TRT_ENGINE_PATH):
+    trt_runner = _TrtRunner(TRT_ENGINE_PATH)
+
+
+def predict_batch(batch):
+    """
+    Forward one (N, 256, 256, 3) float32 batch, returning flat scores.
+    TensorRT when an engine is available, then ONNX Runtime, then XLA.
+    """
+    if trt_runner is not None:
+        return trt_runner(batch)
+    if ort_session is not None:
+        return ort_session.run(None, {ort_input_name: batch})[0].reshape(-1)
+    _get_model()
+    return _INFER(tf.convert_to_tensor(batch)).numpy().reshape(-1)
 
 face_cascade = cv2.CascadeClassifier(
     cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
 )
 
+# res10 SSD face detector: much faster/more robust than Haar on CPU.
+# Used automatically when its files are dropped into weights/.
+DNN_PROTO = "weights/deploy.prototxt"
+DNN_WEIGHTS = "weights/res10_300x300_ssd_iter_140000.caffemodel"
+DNN_CONFIDENCE = 0.5
+
+# Haar cost scales with resolution; cap the detection image at this
+# many pixels on the long side and rescale the boxes afterwards
+DETECT_MAX_SIDE = 480
+
+face_net = None
+if os.path.exists(DNN_PROTO) and os.path.exists(DNN_WEIGHTS):
+    face_net = cv2.dnn.readNetFromCaffe(DNN_PROTO, DNN_WEIGHTS)
+    face_net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+    face_net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+
+
+def detect_faces(frame):
+    """
+    Return face boxes as (x, y, w, h) tuples.
+    SSD detector when available, Haar cascade otherwise.
+    """
+    if face_net is not None:
+        h, w = frame.shape[:2]
+        blob = cv2.dnn.blobFromImage(frame, 1.0, (300, 300), (104.0, 177.0, 123.0))
+        face_net.setInput(blob)
+        detections = face_net.forward()
+
+        boxes = []
+        for i in range(detections.shape[2]):
+            if detections[0, 0, i, 2] < DNN_CONFIDENCE:
+                continue
+            x1, y1, x2, y2 = (detections[0, 0, i, 3:7] * (w, h, w, h)).astype(int)
+            x1, y1 = max(x1, 0), max(y1, 0)
+            x2, y2 = min(x2, w), min(y2, h)
+            if x2 > x1 and y2 > y1:
+                boxes.append((x1, y1, x2 - x1, y2 - y1))
+        return boxes
+
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    h, w = gray.shape
+    scale = DETECT_MAX_SIDE / max(h, w)
+    if scale >= 1.0:
+        return face_cascade.detectMultiScale(gray, 1.3, 5)
+
+    # Detect on the downscaled image (the cascade pyramids anyway),
+    # then map the boxes back onto the full-resolution frame. Same
+    # detectMultiScale parameters as the full-size path: the downscale
+    # itself already sets the floor on detectable face size
+    small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    faces = face_cascade.detectMultiScale(small, 1.3, 5)
+    if len(faces) == 0:
+        return []
+    return (np.asarray(faces) / scale).astype(int)
+
+def _av_frames(container):
+    stream = container.streams.video[0]
+    stream.thread_type = "AUTO"  # frame + slice threaded decode
+    frame_id = 0
+    with container:
+        for frame in container.decode(stream):
+            if frame_id % FRAME_SKIP == 0:
+                yield frame.to_ndarray(format="bgr24")
+            frame_id += 1
+
+
+def _cv2_frames(cap):
+    frame_id = 0
+    try:
+        while True:
+            if frame_id % FRAME_SKIP == 0:
+                # grab + retrieve so skipped frames are never decoded
+                if not cap.grab():
+                    break
+                ret, frame = cap.retrieve()
+                if not ret:
+                    break
+                yield frame
+            elif not cap.grab():
+                break
+            frame_id += 1
+    finally:
+        cap.release()
+
+
+def _frame_source(video_path):
+    """
+    Iterator over every FRAME_SKIP-th frame. PyAV with threaded FFmpeg
+    decode when installed, cv2.VideoCapture otherwise. None if the
+    video cannot be opened.
+    """
+    if av is not None:
+        try:
+            container = av.open(video_path)
+        except Exception:
+            return None
+        return _av_frames(container)
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        return None
+    return _cv2_frames(cap)
+
+
+# Bounded handoff queues keep the pipeline stages in lockstep without
+# letting a fast decoder buffer the whole video in memory
+QUEUE_DEPTH = 8
+
+# Near-duplicate frames (static shots, talking heads) are skipped when
+# their dHash is within this Hamming distance of the previous frame's
+HASH_THRESHOLD = 5
+
+
+def _dhash(frame):
+    """
+    64-bit difference hash: horizontal gradient signs of a 9x8
+    grayscale thumbnail packed into one int.
+    """
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = small[:, 1:] > small[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def _q_put(q, item, stop):
+    """
+    put() that gives up once the consumer has set the stop event, so
+    stages never block forever on a full queue after an abort.
+    """
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _q_get(q, stop):
+    """
+    get() that returns the end-of-stream sentinel once stopped.
+    """
+    while True:
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            if stop.is_set():
+                return None
+
+
+def _decode_stage(frames, decode_q, stop):
+    """
+    Stage A: pull decoded frames and hand them to the detector thread.
+    A decode error travels down the queue instead of dying with the
+    thread, so the consumer can report it.
+    """
+    try:
+        for frame in frames:
+            if not _q_put(decode_q, frame, stop):
+                return
+        _q_put(decode_q, None, stop)
+    except Exception as e:
+        _q_put(decode_q, e, stop)
+    finally:
+        if hasattr(frames, "close"):
+            frames.close()  # release the decoder even on early exit
+
+
+def _detect_stage(decode_q, infer_q, stop):
+    """
+    Stage B: face detection + resize, feeding crops to the inference
+    loop. Runs concurrently with decode since OpenCV releases the GIL.
+    Forwards upstream errors and reports its own the same way.
+    """
+    prev_hash = None
+    try:
+        while True:
+            frame = _q_get(decode_q, stop)
+            if frame is None or isinstance(frame, Exception):
+                _q_put(infer_q, frame, stop)
+                return
+
+            # Hash before the (much more expensive) detector so
+            # near-identical frames cost one thumbnail resize
+            frame_hash = _dhash(frame)
+            if prev_hash is not None and (prev_hash ^ frame_hash).bit_count() < HASH_THRESHOLD:
+                continue
+            prev_hash = frame_hash
+
+            for (x, y, w, h) in detect_faces(frame):
+                # blobFromImage fuses resize + 1/255 scaling + float
+                # conversion into one SIMD pass; the NCHW result is
+                # handed over as an NHWC view for the Keras model
+                blob = cv2.dnn.blobFromImage(
+                    frame[y:y+h, x:x+w],
+                    scalefactor=1.0 / 255.0,
+                    size=(IMG_SIZE, IMG_SIZE),
+                    swapRB=False,
+                )
+                if not _q_put(infer_q, blob[0].transpose(1, 2, 0), stop):
+                    return
+    except Exception as e:
+        _q_put(infer_q, e, stop)
+
+
+class TextureRunner:
+    """
+    Long-lived runner for batch jobs: holds the already-loaded model
+    and streams face crops through a tf.data pipeline, so the model,
+    cascade and TF runtime are paid for once instead of per video.
+    """
+
+    def __init__(self):
+        self.model = _get_model()
+
+    def _faces(self, frames):
+        prev_hash = None
+        for frame in frames:
+            # Same near-duplicate skip as the threaded pipeline
+            frame_hash = _dhash(frame)
+            if prev_hash is not None and (prev_hash ^ frame_hash).bit_count() < HASH_THRESHOLD:
+                continue
+            prev_hash = frame_hash
+
+            for (x, y, w, h) in detect_faces(frame):
+                yield cv2.resize(frame[y:y+h, x:x+w], (IMG_SIZE, IMG_SIZE))
+
+    def scores(self, video_path):
+        """
+        Frame scores for one video, or None when the video cannot be
+        opened. The map/batch/prefetch pipeline overlaps decode +
+        detection with the forward pass.
+        """
+        frames = _frame_source(video_path)
+        if frames is None:
+            return None
+
+        # Pull the first crop eagerly so no-face videos are detected
+        # without spinning up the tf.data pipeline
+        crops = self._faces(frames)
+        first = next(crops, None)
+        if first is None:
+            return np.empty(0, dtype=np.float32)
+
+        ds = tf.data.Dataset.from_generator(
+            lambda: itertools.chain([first], crops),
+            output_signature=tf.TensorSpec((IMG_SIZE, IMG_SIZE, 3), tf.uint8),
+        )
+        ds = ds.map(
+            lambda x: tf.cast(x, tf.float32) / 255.0,
+            num_parallel_calls=tf.data.AUTOTUNE,
+        )
+        ds = ds.batch(BATCH_SIZE).prefetch(tf.data.AUTOTUNE)
+
+        # Feed prefetched batches through predict_batch so this path
+        # hits the same TensorRT / ONNX / XLA preference chain as
+        # analyze_texture instead of bypassing it via Keras predict
+        preds = [predict_batch(batch.numpy()) for batch in ds]
+        return np.concatenate(preds)
+
+    def analyze(self, video_path):
+        """
+        Same result dict as analyze_texture, minus the per-call setup.
+        """
+        result = {
+            "success": False,
+            "video_path": video_path,
+            "frames_analyzed": 0,
+            "fake_ratio": 0,
+            "avg_score": 0,
+            "frame_scores": []
+        }
+
+        try:
+            scores = self.scores(video_path)
+            if scores is None:
+                result["reason"] = "cannot_open_video"
+                return result
+            if scores.size == 0:
+                result["reason"] = "no_faces_detected"
+                return result
+
+            avg_score, fake_ratio = summarize(scores, THRESHOLD)
+            result.update({
+                "success": True,
+                "frames_analyzed": int(scores.size),
+                "fake_ratio": float(fake_ratio),
+                "avg_score": float(avg_score),
+                "frame_scores": scores.tolist()
+            })
+        except Exception as e:
+            result["reason"] = str(e)
+
+        return result
+
+
+@njit(cache=True, fastmath=True)
+def summarize(scores, threshold):
+    """
+    One fused pass over the score array: mean and fraction above the
+    threshold, without numpy's comparison-array temporary.
+    """
+    acc = 0.0
+    n_fake = 0
+    for s in scores:
+        acc += s
+        n_fake += s > threshold
+    return acc / len(scores), n_fake / len(scores)
+
+
 def analyze_texture(video_path, verbose=False):
 
     result = {
@@ -36,39 +502,59 @@ def analyze_texture(video_path, verbose=False):
     }
 
     try:
-        cap = cv2.VideoCapture(video_path)
-        frame_id = 0
-        scores = []
+        frames = _frame_source(video_path)
+        if frames is None:
+            result["reason"] = "cannot_open_video"
+            return result
 
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
+        # Three-stage pipeline: decode and detection run on their own
+        # threads so frame I/O, Haar/SSD work and the model's forward
+        # pass overlap instead of serializing.
+        decode_q = queue.Queue(maxsize=QUEUE_DEPTH)
+        infer_q = queue.Queue(maxsize=QUEUE_DEPTH)
+        stop = threading.Event()
+        threading.Thread(target=_decode_stage, args=(frames, decode_q, stop), daemon=True).start()
+        threading.Thread(target=_detect_stage, args=(decode_q, infer_q, stop), daemon=True).start()
 
-            if frame_id % FRAME_SKIP == 0:
-                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                faces = face_cascade.detectMultiScale(gray, 1.3, 5)
+        # Preallocated batch buffer: crops arrive already scaled to
+        # float32 and are copied straight into a slot of the batch
+        batch_buf = np.empty((BATCH_SIZE, IMG_SIZE, IMG_SIZE, 3), dtype=np.float32)
+        n_pending = 0
+        preds = []
 
-                for (x, y, w, h) in faces:
-                    face = frame[y:y+h, x:x+w]
-                    face = cv2.resize(face, (IMG_SIZE, IMG_SIZE))
-                    face = face.astype("float32") / 255.0
-                    face = np.expand_dims(face, axis=0)
+        try:
+            while True:
+                face = infer_q.get()
+                if face is None:
+                    break
+                if isinstance(face, Exception):
+                    # Stage failure: surface it through the outer
+                    # handler as success=False, matching the
+                    # single-threaded path
+                    raise face
 
-                    pred = model.predict(face, verbose=0)[0][0]
-                    scores.append(float(pred))
+                batch_buf[n_pending] = face
+                n_pending += 1
 
-            frame_id += 1
+                if n_pending == BATCH_SIZE:
+                    preds.append(predict_batch(batch_buf))
+                    n_pending = 0
+        finally:
+            # Unblock the stages whether we finished or aborted, so a
+            # failing video does not leak threads parked on put()
+            stop.set()
 
-        cap.release()
+        if n_pending > 0:
+            preds.append(predict_batch(batch_buf[:n_pending]))
 
-        if len(scores) == 0:
+        if not preds:
             result["reason"] = "no_faces_detected"
             return result
 
-        scores = np.array(scores)
-        avg_score = float(np.mean(scores))
-        fake_ratio = float(np.mean(scores > THRESHOLD))
+        scores = np.concatenate(preds)
+        avg_score, fake_ratio = summarize(scores, THRESHOLD)
+        avg_score = float(avg_score)
+        fake_ratio = float(fake_ratio)
 
         result.update({
             "success": True,
@@ -1,6 +1,5 @@
-import subprocess
+import asyncio
 import json
-from concurrent.futures import ThreadPoolExecutor
 
 # ==========================
 # PATH INTERPRETER
@@ -21,46 +20,50 @@ SCRIPTS = {
 # ==========================
 # HELPER FUNCTION
 # ==========================
-def run_detector(name, python_exec, script):
+async def run_detector(name, python_exec, script):
     """Jalankan script detector dan baca JSON output"""
     try:
-        result = subprocess.run(
-            [python_exec, script],
-            capture_output=True,
-            text=True,
-            check=True
+        proc = await asyncio.create_subprocess_exec(
+            python_exec, script,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
         )
-        # Asumsi setiap script save JSON sendiri
-        # Kita bisa parse stdout jika script print JSON juga
-        return name, json.loads(result.stdout)
-    except subprocess.CalledProcessError as e:
-        print(f"[ERROR] {name} failed:", e.stderr)
-        return name, None
-    except json.JSONDecodeError:
-        # fallback: baca dari file JSON output
-        if name == "emotion":
-            filename = "emotion_evaluation.json"
-        else:
-            filename = f"{name}_evaluation.json"
-        try:
-            with open(filename) as f:
-                return name, json.load(f)
-        except:
+        # communicate() drains both pipes, jadi child tidak pernah
+        # stall karena pipe buffer penuh
+        _, stderr = await proc.communicate()
+
+        if proc.returncode != 0:
+            print(f"[ERROR] {name} failed:", stderr.decode(errors="replace"))
             return name, None
+    except OSError as e:
+        print(f"[ERROR] {name} failed to start:", e)
+        return name, None
+
+    # Setiap script save JSON sendiri; baca dari file, bukan stdout,
+    # supaya result besar tidak lewat pipe
+    if name == "emotion":
+        filename = "emotion_evaluation.json"
+    else:
+        filename = f"{name}_evaluation.json"
+    try:
+        with open(filename) as f:
+            return name, json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return name, None
+
+
+async def run_all():
+    # Semua detector jalan paralel; await tidak memblok thread selama
+    # subprocess masih jalan
+    return await asyncio.gather(
+        *[run_detector(name, py, scr) for name, (py, scr) in SCRIPTS.items()]
+    )
 
 # ==========================
 # MAIN
 # ==========================
 def main():
-    results = {}
-    with ThreadPoolExecutor(max_workers=4) as executor:
-        futures = [
-            executor.submit(run_detector, name, py, scr)
-            for name, (py, scr) in SCRIPTS.items()
-        ]
-        for f in futures:
-            name, res = f.result()
-            results[name] = res
+    results = dict(asyncio.run(run_all()))
 
     print("\n=== FINAL RESULTS ===")
     print(json.dumps(results, indent=2))